@@ -1,54 +1,148 @@
 import json
 import os
-import re
 import logging
 import hmac
 import hashlib
+import time
 import boto3
-import urllib
+import urllib.parse
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from datetime import datetime
 
+try:
+    # RE2 (google-re2) matches in linear time without backtracking
+    import re2 as re
+except ImportError:
+    import re
+
 # Initialize requirements
-logging.basicConfig(level=logging.INFO)
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['DYNAMODB_TABLE'])
+# Lambda installs its own handler on the root logger, so set the level there;
+# LOG_LEVEL=DEBUG brings back the per-request event dump. Unknown values fall
+# back to WARNING rather than failing the cold start.
+logger = logging.getLogger()
+log_level = logging.getLevelName(os.environ.get('LOG_LEVEL', 'WARNING').upper())
+logger.setLevel(log_level if isinstance(log_level, int) else logging.WARNING)
+# Keep pooled connections alive across warm invocations; retries are capped
+# so a throttled write still fits inside Slack's 3 second response window
+boto_config = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+dynamodb = boto3.resource('dynamodb', config=boto_config)
+table_name = os.environ['DYNAMODB_TABLE']
+table = dynamodb.Table(table_name)
+# Key attributes of the table (partition key, then sort key if any), used to
+# dedupe batched writes; comma separated, e.g. "order_id,Timestamp"
+table_key_names = [
+    name.strip()
+    for name in os.environ.get('DYNAMODB_TABLE_KEYS', 'order_id').split(',')
+    if name.strip()
+]
+# Low-level client for writes whose attribute values are built by hand
+dynamodb_client = dynamodb.meta.client
+type_serializer = TypeSerializer()
+# Optional queue that defers the DynamoDB write off the slash command path;
+# the same function consumes it in batches (see store_queued_errors)
+error_queue_url = os.environ.get('ERROR_QUEUE_URL')
+sqs = boto3.client('sqs', config=boto_config) if error_queue_url else None
 
 # Initialize a Slack client
 client = WebClient(token=os.environ['SLACK_BOT_TOKEN'])
 # Slack signing secret for verification
 slack_signing_secret = os.environ['SLACK_SIGNING_SECRET']
+# Keyed once; each request works on a copy so the key pads aren't re-derived
+signature_hmac = hmac.new(
+    slack_signing_secret.encode('utf-8'), digestmod=hashlib.sha256)
+
+# Slash command patterns, compiled once per container. Separators are matched
+# by a single class (no trailing \s*) so a long run of whitespace can't
+# backtrack quadratically; captured values are stripped by the parser.
+# Digits, whitespace and keyword case are spelled out as ASCII classes instead
+# of \d, \s and (?i): stdlib re treats those as Unicode-aware (NBSP, Arabic
+# digits, dotless i) while RE2 does not, so both engines now accept exactly
+# the same commands.
+_ORDER_ID_RE = re.compile(r"[Oo][Rr][Dd][Ee][Rr][_ \t\n\r\f]*[Ii][Dd][=: \t\n\r\f]+([0-9]+)")
+_FLOW_RE = re.compile(r"[Ff][Ll][Oo][Ww][=: \t\n\r\f]+\{?([^}]*)")
+_ERROR_RE = re.compile(r"[Ee][Rr][Rr][Oo][Rr][=: \t\n\r\f]+([^\n,]+)")
+
+# Fixed Slack reply bodies, serialized once per container
+VERIFICATION_FAILED_BODY = json.dumps({
+    "response_type": "ephemeral",
+    "text": "Verification failed"
+})
+INVALID_FORMAT_BODY = json.dumps({
+    "response_type": "ephemeral",
+    "text": "Invalid format. Please use 'order_id: [order_id] flow: [flow] error: [error]'."
+})
+NO_ACTION_BODY = json.dumps({
+    "response_type": "ephemeral",
+    "text": "No action taken"
+})
+# order_id is an int from parse_slash_command, so %d needs no JSON escaping;
+# the queued variant is used when the write is deferred to ERROR_QUEUE_URL
+LOGGED_BODY_TEMPLATE = json.dumps({
+    "response_type": "in_channel",
+    "text": "Your issue with Order ID %d has been logged."
+})
+QUEUED_BODY_TEMPLATE = json.dumps({
+    "response_type": "in_channel",
+    "text": "Your issue with Order ID %d has been queued for logging."
+})
 
 
 def verify_slack_request(slack_signature, timestamp, body):
     """
     Verify the request signature to authenticate Slack requests.
     """
+    # Reject malformed or stale requests before computing the HMAC
+    if not slack_signature or not timestamp:
+        return False
+    if not slack_signature.startswith('v0=') or len(slack_signature) != 67:
+        return False
+    try:
+        if abs(time.time() - int(timestamp)) > 60 * 5:
+            return False
+    except ValueError:
+        return False
+
     # Use the original URL-encoded body for signature verification
     sig_basestring = f"v0:{timestamp}:{body}"
-    my_signature = 'v0=' + hmac.new(
-        bytes(slack_signing_secret, 'utf-8'),
-        bytes(sig_basestring, 'utf-8'),
-        hashlib.sha256
-    ).hexdigest()
-
-    logging.info(f"Received Slack Signature: {slack_signature}")
-    logging.info(f"Computed Signature: {my_signature}")
+    request_hmac = signature_hmac.copy()
+    request_hmac.update(sig_basestring.encode('utf-8'))
+    my_signature = 'v0=' + request_hmac.hexdigest()
 
     return hmac.compare_digest(my_signature, slack_signature)
 
 
+def serialize_error_log(data):
+    """
+    Build the DynamoDB attribute-value item for an error log directly,
+    skipping the resource layer's generic TypeSerializer walk.
+    """
+    return {
+        "order_id": {"N": str(data["order_id"])},
+        "Flow": {"L": [{"S": step} for step in data["Flow"]]},
+        "Error": {"S": data["Error"]},
+        "Timestamp": {"S": data["Timestamp"]}
+    }
+
+
 def parse_slash_command(text):
     """
     Parse the slash command text to extract order_id, flow, and error.
     """
-    order_id_match = re.search(
-        r"order[_\s]*id[=:\s]+\s*(\d+)", text, re.IGNORECASE)
-    flow_match = re.search(
-        r"flow[=:\s]+\s*{?\s*([^}]*)\s*}?", text, re.IGNORECASE)
-    error_match = re.search(
-        r"error[=:\s]+\s*([^\n,]+)", text, re.IGNORECASE)
+    order_id_match = _ORDER_ID_RE.search(text)
+    flow_match = _FLOW_RE.search(text)
+    error_match = _ERROR_RE.search(text)
+
+    # DynamoDB numbers hold at most 38 significant digits; reject longer IDs
+    # here so they never reach the table or the SQS queue
+    if order_id_match and len(order_id_match.group(1).lstrip('0')) > 38:
+        return None
 
     if order_id_match and flow_match and error_match:
         flow_list = [event.strip() for event in flow_match.group(1).split(',')]
@@ -60,16 +154,45 @@ def parse_slash_command(text):
         }
 
 
-def lambda_handler(event, context):
-    print(event)
-    try:
-        logging.info("Received event: %s", event)
+def store_queued_errors(records):
+    """
+    Write queued error logs to DynamoDB, batching them into BatchWriteItem calls.
+    Records that can't be parsed or stored are reported back to SQS as batch
+    item failures.
+    """
+    failures = []
+
+    # batch_writer flushes every 25 items and resends any UnprocessedItems;
+    # overwrite_by_pkeys keeps the last of several items sharing a key (SQS
+    # redeliveries, repeated order IDs), as put_item would, instead of
+    # failing the whole BatchWriteItem on duplicate keys
+    with table.batch_writer(overwrite_by_pkeys=table_key_names) as batch:
+        for record in records:
+            try:
+                item = json.loads(record['body'])
+                if not isinstance(item, dict) or any(name not in item for name in table_key_names):
+                    raise ValueError("missing key attributes")
+                # Serialize here so a bad value (e.g. a number over DynamoDB's
+                # 38 digits) fails this record rather than the batch flush
+                type_serializer.serialize(item)
+            except (ValueError, TypeError, ArithmeticError) as e:
+                logger.error("Skipping malformed queued error log %s: %s", record['messageId'], e)
+                failures.append({"itemIdentifier": record['messageId']})
+                continue
+            batch.put_item(Item=item)
 
-        # Extract necessary details from the event
-        parsed_body = urllib.parse.parse_qs(event['body'])
-        slack_event = {k: v[0] for k, v in parsed_body.items()}
+    return {"batchItemFailures": failures}
+
+
+def lambda_handler(event, context):
+    logger.debug("Received event: %s", event)
+    # SQS-triggered invocations carry a batch of already-parsed error logs;
+    # a failed DynamoDB write raises so the whole batch is returned to the
+    # queue, while malformed records are reported individually.
+    if 'Records' in event:
+        return store_queued_errors(event['Records'])
 
-        # Now use 'slack_event' as a dictionary with the parsed parameters
+    try:
         timestamp = event['headers'].get('X-Slack-Request-Timestamp')
         slack_signature = event['headers'].get('X-Slack-Signature')
 
@@ -77,23 +200,22 @@ def lambda_handler(event, context):
             return {
                 "statusCode": 200,  # Always return 200 OK to acknowledge receipt
                 "headers": {"Content-Type": "application/json"},
-                "body": json.dumps({
-                    "response_type": "ephemeral",
-                    "text": "Verification failed"
-                })
+                "body": VERIFICATION_FAILED_BODY
             }
 
-        if 'command' in slack_event and slack_event['command'] == '/logerror':
+        # Parse the form body only after verification; Slack sends about a
+        # dozen fields, so cap them and let oversized bodies fail fast
+        slack_event = dict(urllib.parse.parse_qsl(
+            event['body'], keep_blank_values=True, max_num_fields=64))
+
+        if slack_event.get('command') == '/logerror':
             parsed_data = parse_slash_command(slack_event['text'])
 
             if not parsed_data:
                 return {
                     "statusCode": 200,
                     "headers": {"Content-Type": "application/json"},
-                    "body": json.dumps({
-                        "response_type": "ephemeral",
-                        "text": "Invalid format. Please use 'order_id: [order_id] flow: [flow] error: [error]'."
-                    })
+                    "body": INVALID_FORMAT_BODY
                 }
             else:
                 order_id = parsed_data["order_id"]
@@ -107,28 +229,29 @@ def lambda_handler(event, context):
                 "Timestamp": datetime.now().isoformat()
             }
 
-            table.put_item(Item=data)
+            if error_queue_url:
+                sqs.send_message(
+                    QueueUrl=error_queue_url, MessageBody=json.dumps(data))
+                body = QUEUED_BODY_TEMPLATE % order_id
+            else:
+                dynamodb_client.put_item(
+                    TableName=table_name, Item=serialize_error_log(data))
+                body = LOGGED_BODY_TEMPLATE % order_id
 
             return {
                 "statusCode": 200,
                 "headers": {"Content-Type": "application/json"},
-                "body": json.dumps({
-                    "response_type": "in_channel",
-                    "text": f"Your issue with Order ID {order_id} has been logged."
-                })
+                "body": body
             }
 
         return {
             "statusCode": 200,
             "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({
-                "response_type": "ephemeral",
-                "text": "No action taken"
-            })
+            "body": NO_ACTION_BODY
         }
 
     except SlackApiError as e:
-        logging.error(f"Slack API Error: {e}")
+        logger.error("Slack API Error: %s", e)
         return {
             "statusCode": 200,
             "headers": {"Content-Type": "application/json"},
@@ -139,7 +262,7 @@ def lambda_handler(event, context):
         }
 
     except Exception as e:
-        logging.error(f"General Error: {e}")
+        logger.error("General Error: %s", e)
         return {
             "statusCode": 200,
             "headers": {"Content-Type": "application/json"},